@@ -1,10 +1,22 @@
-from abc import ABC, abstractmethod
-from base64 import b64encode
-import binascii
-import requests
+from abc import ABCMeta, abstractmethod
 import logging
 import json
 
+try:
+    import orjson
+
+    # Single Rust-side fast path; OPT_SERIALIZE_NUMPY costs nothing while
+    # the payloads stay plain dicts but future-proofs array commands.
+    _PAYLOAD_OPTS = orjson.OPT_SERIALIZE_NUMPY
+
+    def _json_dumps(data):
+        """Serialize with orjson, which is much faster than the stdlib."""
+        # utf-8, not ascii: orjson does not escape non-ASCII characters
+        # the way the stdlib encoder does
+        return orjson.dumps(data, option=_PAYLOAD_OPTS).decode('utf-8')
+except ImportError:
+    _json_dumps = json.dumps
+
 from homeassistant.const import ATTR_ENTITY_ID
 from . import Helper
 _LOGGER = logging.getLogger(__name__)
@@ -17,27 +29,25 @@ ENC_HEX = 'Hex'
 ENC_PRONTO = 'Pronto'
 ENC_RAW = 'Raw'
 
-MQTT_COMMANDS_ENCODING = [ENC_RAW]
-LOOKIN_COMMANDS_ENCODING = [ENC_PRONTO, ENC_RAW]
-ESPHOME_COMMANDS_ENCODING = [ENC_RAW]
-UFOR11_COMMANDS_ENCODING = [ENC_RAW]
+MQTT_COMMANDS_ENCODING = frozenset({ENC_RAW})
+LOOKIN_COMMANDS_ENCODING = frozenset({ENC_PRONTO, ENC_RAW})
+ESPHOME_COMMANDS_ENCODING = frozenset({ENC_RAW})
+UFOR11_COMMANDS_ENCODING = frozenset({ENC_RAW})
 
 
 def get_controller(hass, controller, encoding, controller_data, delay):
     """Return a controller compatible with the specification provided."""
-    controllers = {
-        MQTT_CONTROLLER: MQTTController,
-        UFOR11_CONTROLLER: UFOR11Controller
-    }
-    # controller = UFOR11Controller
-    try:
-        return UFOR11Controller(hass, controller, encoding, controller_data, delay) # controllers[controller](hass, controller, encoding, controller_data, delay)
-    except KeyError:
+    cls = _CONTROLLERS.get(controller)
+    if cls is None:
         raise Exception("The controller is not supported.")
+    return cls(hass, controller, encoding, controller_data, delay)
 
 
-class AbstractController(ABC):
+class AbstractController(metaclass=ABCMeta):
     """Representation of a controller."""
+    __slots__ = ('hass', '_controller', '_encoding', '_controller_data',
+                 '_delay')
+
     def __init__(self, hass, controller, encoding, controller_data, delay):
         self.check_encoding(encoding)
         self.hass = hass
@@ -58,6 +68,16 @@ class AbstractController(ABC):
 
 class MQTTController(AbstractController):
     """Controls a MQTT device."""
+    __slots__ = ('_service_data',)
+
+    def __init__(self, hass, controller, encoding, controller_data, delay):
+        super().__init__(hass, controller, encoding, controller_data, delay)
+        # Reused across sends; async_call copies the data into the
+        # ServiceCall before returning, so updating it in place is safe.
+        self._service_data = {
+            'topic': controller_data,
+            'payload': None
+        }
 
     def check_encoding(self, encoding):
         """Check if the encoding is supported by the controller."""
@@ -67,16 +87,21 @@ class MQTTController(AbstractController):
 
     async def send(self, command):
         """Send a command."""
-        service_data = {
-            'topic': self._controller_data,
-            'payload': command
-        }
+        self._service_data['payload'] = command
 
         await self.hass.services.async_call(
-            'mqtt', 'publish', service_data)
+            'mqtt', 'publish', self._service_data)
 
 class UFOR11Controller(MQTTController):
     """Controls a UFO-R11 device."""
+    __slots__ = ('_payload_prefix', '_payload_suffix')
+
+    def __init__(self, hass, controller, encoding, controller_data, delay):
+        super().__init__(hass, controller, encoding, controller_data, delay)
+        # Precomputed JSON template so send() can build the payload by
+        # concatenation instead of running the JSON encoder on every command.
+        self._payload_prefix = '{"ir_code_to_send":"'
+        self._payload_suffix = '"}'
 
     def check_encoding(self, encoding):
         """Check if the encoding is supported by the controller."""
@@ -89,14 +114,22 @@ class UFOR11Controller(MQTTController):
         _LOGGER.debug(f"UFOR11Controller sending command: {command}")
         _LOGGER.debug(f"MQTT topic: {self._controller_data}")
 
-        service_data = {
-            'topic': self._controller_data,
-            'payload': json.dumps({"ir_code_to_send": command})
-        }
+        if '"' not in command and '\\' not in command:
+            payload = self._payload_prefix + command + self._payload_suffix
+        else:
+            payload = _json_dumps({"ir_code_to_send": command})
 
-        _LOGGER.debug(f"MQTT payload: {service_data['payload']}")
+        self._service_data['payload'] = payload
+
+        _LOGGER.debug(f"MQTT payload: {payload}")
 
         await self.hass.services.async_call(
-            'mqtt', 'publish', service_data)
+            'mqtt', 'publish', self._service_data)
 
         _LOGGER.debug("MQTT publish service called successfully")
+
+
+_CONTROLLERS = {
+    MQTT_CONTROLLER: MQTTController,
+    UFOR11_CONTROLLER: UFOR11Controller
+}
@@ -6,15 +6,47 @@ This script loads the Toshiba device codes and sends IR commands via MQTT,
 allowing interactive testing of each command with user confirmation.
 """
 
+import argparse
+import asyncio
 import json
 import logging
 import os
 import sys
+import threading
 from typing import Dict, Any, List
 import paho.mqtt.client as mqtt
-import time
 from dotenv import load_dotenv
 
+try:
+    # orjson serializes to bytes, which paho publishes directly without
+    # the str -> bytes round trip the stdlib encoder would require.
+    import orjson
+
+    # Single Rust-side fast path; OPT_SERIALIZE_NUMPY costs nothing while
+    # the payloads stay plain dicts but future-proofs array commands.
+    PAYLOAD_OPTS = orjson.OPT_SERIALIZE_NUMPY
+
+    def _dumps(data):
+        return orjson.dumps(data, option=PAYLOAD_OPTS)
+
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    # Bind the decoder method once: json.loads rebuilds its wrapper and
+    # resolves attributes on every call, the bound decode does not.
+    _decode = json.JSONDecoder().decode
+
+    def _loads(data):
+        # JSONDecoder.decode only accepts str, and the codes file is read
+        # as bytes for orjson's benefit
+        return _decode(data if isinstance(data, str) else data.decode('utf-8'))
+
+try:
+    # Optional: only needed for the non-interactive --pipeline mode
+    import aiomqtt
+except ImportError:
+    aiomqtt = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,6 +55,47 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class AsyncioMQTTHelper:
+    """Drive a paho client from the asyncio event loop.
+
+    Wires paho's socket callbacks into the running loop (the pattern from
+    paho's loop_asyncio example) so publishes run on the same event loop as
+    user input instead of a dedicated network thread.
+    """
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.misc_task = None
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc_task = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self.misc_task:
+            self.misc_task.cancel()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def _misc_loop(self):
+        # Periodic keepalive/retry housekeeping normally done by loop_start()
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+
 class ToshibaMQTTTester:
     """MQTT client for testing Toshiba AC commands."""
 
@@ -35,9 +108,17 @@ class ToshibaMQTTTester:
         self.mqtt_username = mqtt_username
         self.mqtt_password = mqtt_password
         self.client = None
+        self._helper = None
         self.connected = False
-
-    def connect(self) -> bool:
+        self._connected_event = asyncio.Event()
+        self._disconnected_event = asyncio.Event()
+        # Precomputed JSON template so send_command() can build the payload
+        # by concatenation instead of invoking the JSON encoder per command.
+        # Kept as bytes: paho publishes bytes as-is, skipping str.encode().
+        self._payload_prefix = b'{"ir_code_to_send":"'
+        self._payload_suffix = b'"}'
+
+    async def connect(self) -> bool:
         """Connect to MQTT broker."""
         try:
             self.client = mqtt.Client()
@@ -51,37 +132,41 @@ class ToshibaMQTTTester:
             self.client.on_disconnect = self._on_disconnect
             self.client.on_publish = self._on_publish
 
-            logger.info(f"Connecting to MQTT broker at {self.mqtt_host}:{self.mqtt_port}")
-            self.client.connect(self.mqtt_host, self.mqtt_port, 60)
-            self.client.loop_start()
+            # Run the network loop on the asyncio event loop instead of a
+            # loop_start() background thread
+            self._helper = AsyncioMQTTHelper(asyncio.get_running_loop(), self.client)
 
-            # Wait for connection
-            timeout = 10
-            while not self.connected and timeout > 0:
-                time.sleep(0.5)
-                timeout -= 0.5
+            logger.info("Connecting to MQTT broker at %s:%s", self.mqtt_host, self.mqtt_port)
+            self.client.connect(self.mqtt_host, self.mqtt_port, 60)
 
-            if not self.connected:
+            # Wait for connection; _on_connect wakes us immediately instead
+            # of the old 0.5 s sleep-polling loop
+            try:
+                await asyncio.wait_for(self._connected_event.wait(), timeout=10)
+            except asyncio.TimeoutError:
                 logger.error("Failed to connect to MQTT broker within timeout")
                 return False
 
             return True
 
         except Exception as e:
-            logger.error(f"MQTT connection error: {e}")
+            logger.error("MQTT connection error: %s", e)
             return False
 
     def _on_connect(self, client, userdata, flags, rc):
         """MQTT connection callback."""
         if rc == 0:
             self.connected = True
+            self._connected_event.set()
             logger.info("Successfully connected to MQTT broker")
         else:
-            logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
+            logger.error("Failed to connect to MQTT broker. Return code: %s", rc)
 
     def _on_disconnect(self, client, userdata, rc):
         """MQTT disconnection callback."""
         self.connected = False
+        self._connected_event.clear()
+        self._disconnected_event.set()
         if rc != 0:
             logger.warning("Unexpected disconnection from MQTT broker")
         else:
@@ -89,9 +174,9 @@ class ToshibaMQTTTester:
 
     def _on_publish(self, client, userdata, mid):
         """MQTT publish callback."""
-        logger.debug(f"Message {mid} published successfully")
+        logger.debug("Message %s published successfully", mid)
 
-    def send_command(self, command_name: str, command_data: str) -> bool:
+    async def send_command(self, command_name: str, command_data: str) -> bool:
         """Send IR command via MQTT using UFO-R11 format."""
         if not self.connected:
             logger.error("Not connected to MQTT broker")
@@ -99,36 +184,112 @@ class ToshibaMQTTTester:
 
         try:
             # Create MQTT payload for UFO-R11 device
-            payload = {
-                "ir_code_to_send": command_data
-            }
+            if '"' not in command_data and '\\' not in command_data:
+                payload = (self._payload_prefix
+                           + command_data.encode('ascii')
+                           + self._payload_suffix)
+            else:
+                payload = _dumps({"ir_code_to_send": command_data})
 
             # Publish command
-            result = self.client.publish(self.mqtt_topic, json.dumps(payload))
+            result = self.client.publish(self.mqtt_topic, payload)
+
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                logger.info("Successfully sent command '%s' to topic '%s'", command_name, self.mqtt_topic)
+                return True
+            else:
+                logger.error("Failed to publish command '%s'. Return code: %s", command_name, result.rc)
+                return False
+
+        except Exception as e:
+            logger.error("Error sending command '%s': %s", command_name, e)
+            return False
+
+    async def send_prepared(self, command_name: str, payload) -> bool:
+        """Publish an already-serialized IR command payload."""
+        if not self.connected:
+            logger.error("Not connected to MQTT broker")
+            return False
+
+        try:
+            result = self.client.publish(self.mqtt_topic, payload)
+
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                logger.info("Successfully sent command '%s' to topic '%s'", command_name, self.mqtt_topic)
+                return True
+            else:
+                logger.error("Failed to publish command '%s'. Return code: %s", command_name, result.rc)
+                return False
+
+        except Exception as e:
+            logger.error("Error sending command '%s': %s", command_name, e)
+            return False
+
+    async def send_batch(self, batch: List[tuple]) -> bool:
+        """Send several IR commands in a single MQTT publish.
+
+        Amortizes the per-message broker and framing overhead by wrapping
+        the commands in one multi-code envelope. The receiving side needs
+        a matching batch decoder.
+        """
+        if not self.connected:
+            logger.error("Not connected to MQTT broker")
+            return False
+
+        try:
+            payload = _dumps({"batch": [
+                {"name": name, "ir_code_to_send": data}
+                for name, data in batch
+            ]})
+
+            result = self.client.publish(self.mqtt_topic, payload)
 
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                logger.info(f"Successfully sent command '{command_name}' to topic '{self.mqtt_topic}'")
+                logger.info("Successfully sent batch of %s commands to topic '%s'", len(batch), self.mqtt_topic)
                 return True
             else:
-                logger.error(f"Failed to publish command '{command_name}'. Return code: {result.rc}")
+                logger.error("Failed to publish batch. Return code: %s", result.rc)
                 return False
 
         except Exception as e:
-            logger.error(f"Error sending command '{command_name}': {e}")
+            logger.error("Error sending batch: %s", e)
             return False
 
-    def disconnect(self):
-        """Disconnect from MQTT broker."""
-        if self.client:
-            self.client.loop_stop()
-            self.client.disconnect()
+    async def flush(self):
+        """Wait until paho's out-queue has been written to the socket.
+
+        With the socket callbacks installed, publish() only queues the
+        packet and registers a writer; the event loop has to run before
+        anything hits the wire, so yield until paho has nothing left.
+        """
+        while self.client and self.client.want_write():
+            await asyncio.sleep(0.05)
+
+    async def disconnect(self):
+        """Disconnect from MQTT broker, draining queued publishes first."""
+        if not self.client:
+            return
+
+        # Flush pending publishes, then wait for the DISCONNECT handshake
+        # (the disconnected-future pattern from paho's loop_asyncio example)
+        # so asyncio.run doesn't tear the loop down with packets queued
+        await self.flush()
+        self._disconnected_event.clear()
+        self.client.disconnect()
+        if self.connected:
+            try:
+                await asyncio.wait_for(self._disconnected_event.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning("Timed out waiting for MQTT disconnect")
 
 
 def load_toshiba_commands(json_file_path: str) -> Dict[str, Any]:
     """Load Toshiba device commands from JSON file."""
     try:
-        with open(json_file_path, 'r') as f:
-            data = json.load(f)
+        # Read the file in binary in one go: orjson parses bytes directly,
+        # skipping the text-mode UTF-8 decode pass over the whole file.
+        with open(json_file_path, 'rb') as f:
+            data = _loads(f.read())
         logger.info(f"Successfully loaded Toshiba commands from {json_file_path}")
         return data
     except FileNotFoundError:
@@ -146,29 +307,97 @@ def extract_all_commands(commands: Dict[str, Any]) -> List[tuple]:
     """Extract all commands from the nested structure."""
     all_commands = []
 
-    def extract_recursive(obj, path=""):
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                current_path = f"{path}.{key}" if path else key
-                if isinstance(value, str):
-                    # This is a command string
-                    all_commands.append((current_path, value))
-                else:
-                    # Continue recursing
-                    extract_recursive(value, current_path)
-
-    extract_recursive(commands)
+    # Walk the tree with an explicit stack instead of recursion: no frame
+    # allocation per node and no recursion-limit risk on deep climate codes.
+    # Children are pushed in reverse so commands pop in document order.
+    # Keys like fan modes and temperatures recur across every branch of the
+    # tree; interning them shares one string object per distinct segment.
+    intern = sys.intern
+    stack = [("", commands)]
+    while stack:
+        path, obj = stack.pop()
+        if isinstance(obj, str):
+            # This is a command string
+            all_commands.append((path, obj))
+        elif isinstance(obj, dict):
+            for key, value in reversed(obj.items()):
+                key = intern(key)
+                stack.append((path + '.' + key if path else key, value))
+
     return all_commands
 
 
-def get_user_confirmation() -> bool:
+async def pipeline_commands(payloads: List[bytes], mqtt_host: str, mqtt_port: int,
+                            mqtt_topic: str, mqtt_username: str = None,
+                            mqtt_password: str = None) -> int:
+    """Publish all payloads concurrently over one aiomqtt connection.
+
+    QoS-0 publishes need no broker ack, so pipelining them hides the
+    broker round-trip; the semaphore caps how many are in flight.
+    Returns the number of failed publishes.
+    """
+    semaphore = asyncio.Semaphore(32)
+
+    async with aiomqtt.Client(hostname=mqtt_host, port=mqtt_port,
+                              username=mqtt_username,
+                              password=mqtt_password) as client:
+        async def publish(payload):
+            async with semaphore:
+                await client.publish(mqtt_topic, payload)
+
+        results = await asyncio.gather(*(publish(p) for p in payloads),
+                                       return_exceptions=True)
+
+    failures = sum(1 for r in results if isinstance(r, Exception))
+    if failures:
+        logger.error("Failed to publish %s of %s commands", failures, len(results))
+    return failures
+
+
+async def get_user_confirmation() -> bool:
     """Get user confirmation to send next command."""
-    response = input("Press Enter to continue or 'q' to quit: ").strip().lower()
-    return response != 'q'
+    # input() blocks, so run it on a daemon thread to keep the MQTT loop
+    # alive. The default executor's non-daemon workers would make
+    # asyncio.run hang on Ctrl-C until the user pressed Enter.
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _deliver(response):
+        if not future.done():
+            future.set_result(response)
+
+    def _prompt():
+        try:
+            response = input("Press Enter to continue or 'q' to quit: ")
+        except EOFError:
+            response = 'q'
+        try:
+            loop.call_soon_threadsafe(_deliver, response)
+        except RuntimeError:
+            # Loop shut down while waiting for input
+            pass
 
+    threading.Thread(target=_prompt, daemon=True).start()
+    response = await future
+    return response.strip().lower() != 'q'
 
-def main():
+
+async def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="Send Toshiba AC IR commands via MQTT")
+    parser.add_argument(
+        '--batch', type=int, default=0, metavar='N',
+        help="send commands non-interactively, N per MQTT message "
+             "(default: interactive, one message per command)")
+    parser.add_argument(
+        '--pipeline', action='store_true',
+        help="send all commands non-interactively with concurrent publishes "
+             "over aiomqtt (requires the aiomqtt package)")
+    args = parser.parse_args()
+
+    if args.pipeline and aiomqtt is None:
+        parser.error("--pipeline requires the aiomqtt package (pip install aiomqtt)")
+
     # Load environment variables from .env file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(script_dir)
@@ -207,6 +436,20 @@ def main():
     all_commands = extract_all_commands(commands)
     logger.info(f"Found {len(all_commands)} total commands")
 
+    # Serialize every payload once up front, so each confirmation in the
+    # interactive loop triggers nothing more than a socket write
+    payloads = [_dumps({"ir_code_to_send": data}) for _, data in all_commands]
+
+    if args.pipeline:
+        # Non-interactive: pipeline every publish over one aiomqtt connection
+        failures = await pipeline_commands(
+            payloads, mqtt_host, mqtt_port, mqtt_topic,
+            mqtt_username, mqtt_password)
+        if failures:
+            sys.exit(1)
+        logger.info("Command testing completed")
+        return
+
     # Initialize MQTT client
     mqtt_client = ToshibaMQTTTester(
         mqtt_host=mqtt_host,
@@ -217,39 +460,57 @@ def main():
     )
 
     # Connect to MQTT broker
-    if not mqtt_client.connect():
+    if not await mqtt_client.connect():
         logger.error("Failed to connect to MQTT broker")
         sys.exit(1)
 
     try:
+        if args.batch > 0:
+            # Non-interactive: publish the commands in multi-code envelopes
+            for start in range(0, len(all_commands), args.batch):
+                chunk = all_commands[start:start + args.batch]
+                if not await mqtt_client.send_batch(chunk):
+                    logger.warning(f"Failed to send batch starting at command {start + 1}")
+                # Yield so the event loop can run paho's writer callback
+                # instead of just growing the out-queue
+                await asyncio.sleep(0)
+
+            # Make sure every queued envelope reaches the socket before
+            # returning tears the loop down
+            await mqtt_client.flush()
+            logger.info("Command testing completed")
+            return
+
         # Send commands one by one with user confirmation
         for i, (command_name, command_data) in enumerate(all_commands, 1):
             print(f"\n--- Command {i}/{len(all_commands)}: {command_name} ---")
             print(f"Command data: {command_data[:50]}{'...' if len(command_data) > 50 else ''}")
 
             # Send command
-            success = mqtt_client.send_command(command_name, command_data)
+            success = await mqtt_client.send_prepared(command_name, payloads[i - 1])
 
             if not success:
                 logger.warning(f"Failed to send command '{command_name}'")
 
             # Ask for user confirmation before next command (except for last command)
             if i < len(all_commands):
-                if not get_user_confirmation():
+                if not await get_user_confirmation():
                     logger.info("User requested to stop. Exiting...")
                     break
 
         logger.info("Command testing completed")
 
-    except KeyboardInterrupt:
-        logger.info("Interrupted by user. Exiting...")
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
     finally:
         # Cleanup
-        mqtt_client.disconnect()
+        await mqtt_client.disconnect()
         logger.info("Disconnected from MQTT broker")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Raised out of asyncio.run, not inside the coroutine
+        logger.info("Interrupted by user. Exiting...")
\ No newline at end of file